@@ -1,52 +1,210 @@
-import sqlite3
-from rank_bm25 import BM25Okapi
+import heapq
+import re
+import sys
+from functools import lru_cache
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Action keywords per website, keyed by main domain. Keywords are stored lowercased so
+# they can be used directly as BM25 query tokens.
+DOMAIN_KEYWORDS = {
+    # E-commerce sites
+    "amazon.com": ("buy", "add", "cart", "purchase", "order", "shop", "checkout", "wishlist"),
+    "ebay.com": ("bid", "buy", "sell", "auction", "purchase", "cart", "order"),
+    "etsy.com": ("buy", "purchase", "cart", "shop", "favorite", "order"),
+    
+    # Content/Media sites  
+    "youtube.com": ("watch", "play", "subscribe", "like", "comment", "share", "upload"),
+    "netflix.com": ("watch", "play", "stream", "episode", "movie", "series", "resume"),
+    "spotify.com": ("play", "listen", "playlist", "song", "album", "follow", "shuffle"),
+    
+    # Productivity sites
+    "docs.google.com": ("write", "edit", "format", "document", "text", "share", "comment"),
+    "sheets.google.com": ("calculate", "formula", "cell", "chart", "data", "filter", "sort"),
+    "notion.so": ("write", "edit", "page", "block", "template", "database", "organize"),
+    
+    # Social media
+    "twitter.com": ("tweet", "post", "share", "follow", "like", "retweet", "comment"),
+    "facebook.com": ("post", "share", "like", "comment", "friend", "message", "photo"),
+    "linkedin.com": ("connect", "message", "share", "post", "endorse", "follow", "apply"),
+    
+    # Development
+    "github.com": ("commit", "push", "pull", "code", "repository", "fork", "clone", "merge"),
+    "stackoverflow.com": ("ask", "answer", "vote", "comment", "search", "question", "solution"),
+    
+    # Search/Information
+    "google.com": ("search", "find", "query", "result", "explore", "discover"),
+    "wikipedia.org": ("read", "search", "article", "edit", "reference", "learn"),
+    
+    # Banking/Finance
+    "chase.com": ("transfer", "pay", "deposit", "balance", "statement", "account"),
+    "paypal.com": ("send", "pay", "transfer", "receive", "balance", "transaction"),
+}
+
+DEFAULT_KEYWORDS = ("click", "select", "view", "navigate", "action", "complete")
 
 def get_domain_intent_keywords(domain):
     """Return relevant action keywords based on the website's primary purpose"""
-    domain_keywords = {
-        # E-commerce sites
-        "amazon.com": ["buy", "add", "cart", "purchase", "order", "shop", "checkout", "wishlist"],
-        "ebay.com": ["bid", "buy", "sell", "auction", "purchase", "cart", "order"],
-        "etsy.com": ["buy", "purchase", "cart", "shop", "favorite", "order"],
-        
-        # Content/Media sites  
-        "youtube.com": ["watch", "play", "subscribe", "like", "comment", "share", "upload"],
-        "netflix.com": ["watch", "play", "stream", "episode", "movie", "series", "resume"],
-        "spotify.com": ["play", "listen", "playlist", "song", "album", "follow", "shuffle"],
-        
-        # Productivity sites
-        "docs.google.com": ["write", "edit", "format", "document", "text", "share", "comment"],
-        "sheets.google.com": ["calculate", "formula", "cell", "chart", "data", "filter", "sort"],
-        "notion.so": ["write", "edit", "page", "block", "template", "database", "organize"],
-        
-        # Social media
-        "twitter.com": ["tweet", "post", "share", "follow", "like", "retweet", "comment"],
-        "facebook.com": ["post", "share", "like", "comment", "friend", "message", "photo"],
-        "linkedin.com": ["connect", "message", "share", "post", "endorse", "follow", "apply"],
-        
-        # Development
-        "github.com": ["commit", "push", "pull", "code", "repository", "fork", "clone", "merge"],
-        "stackoverflow.com": ["ask", "answer", "vote", "comment", "search", "question", "solution"],
-        
-        # Search/Information
-        "google.com": ["search", "find", "query", "result", "explore", "discover"],
-        "wikipedia.org": ["read", "search", "article", "edit", "reference", "learn"],
-        
-        # Banking/Finance
-        "chase.com": ["transfer", "pay", "deposit", "balance", "statement", "account"],
-        "paypal.com": ["send", "pay", "transfer", "receive", "balance", "transaction"],
-    }
-    
     # Extract main domain (remove subdomains)
     main_domain = domain.lower()
     if main_domain.startswith('www.'):
         main_domain = main_domain[4:]
     
     # Return specific keywords or default to general action words
-    return domain_keywords.get(main_domain, ["click", "select", "view", "navigate", "action", "complete"])
+    return DOMAIN_KEYWORDS.get(main_domain, DEFAULT_KEYWORDS)
+
+@lru_cache(maxsize=100_000)
+def tokenize(action_text):
+    """Lowercase alphanumeric tokens of an action, interned since scraped actions repeat heavily"""
+    return tuple(sys.intern(t) for t in TOKEN_RE.findall(action_text.lower()))
+
+def _query_postings(tokenized_docs, query_terms, epsilon):
+    """
+    Build the posting table for the query terms of a tokenized corpus
+
+    Documents are laid out as a CSR-style table of (doc id, term id, term frequency) so BM25
+    contributions can be computed as vectorized expressions instead of a dict scan per
+    document. IDF flooring matches rank_bm25's BM25Okapi.
+
+    Returns:
+        tuple: (docs, terms, tf, doc_len, weighted_idf, avgdl) for every posting of a query
+        term, or None when no document contains a query term
+    """
+    n_docs = len(tokenized_docs)
+
+    # Token vocabulary and per-document token id arrays
+    vocab = {}
+    doc_tokens = [np.array([vocab.setdefault(t, len(vocab)) for t in doc], dtype=np.int32) for doc in tokenized_docs]
+    n_terms = len(vocab)
+
+    doc_len = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float32)
+    avgdl = doc_len.mean() if n_docs else 0.0
+    if n_terms == 0 or avgdl == 0:
+        return None
+
+    query_ids = [vocab[t] for t in query_terms if t in vocab]
+    if not query_ids:
+        return None
+
+    # Postings: unique (doc, term) pairs with their term frequency
+    token_ids = np.concatenate(doc_tokens).astype(np.int64)
+    token_docs = np.repeat(np.arange(n_docs, dtype=np.int64), doc_len.astype(np.int64))
+    pairs, tf = np.unique(token_docs * n_terms + token_ids, return_counts=True)
+    post_docs = pairs // n_terms
+    post_terms = pairs % n_terms
+
+    # IDF with negative values floored to epsilon * average idf
+    df = np.bincount(post_terms, minlength=n_terms).astype(np.float32)
+    idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+    idf[idf < 0] = epsilon * idf.mean()
+
+    # Repeated query terms count once per occurrence
+    query_weight = np.bincount(query_ids, minlength=n_terms).astype(np.float32)
 
-def bm25_filter(db_path="intents.db", threshold=0.3):
-    conn = sqlite3.connect(db_path)
+    mask = query_weight[post_terms] > 0
+    docs = post_docs[mask]
+    terms = post_terms[mask]
+    return docs, terms, tf[mask].astype(np.float32), doc_len[docs], idf[terms] * query_weight[terms], avgdl
+
+def _bm25_contrib(tf, doc_len, idf, avgdl, k1, b):
+    return idf * (tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len / avgdl)))
+
+def bm25_scores(tokenized_docs, query_terms, k1=1.5, b=0.75, epsilon=0.25):
+    """
+    Okapi BM25 scores of every document against the query, computed over NumPy arrays
+
+    Args:
+        tokenized_docs (list[list[str]]): Tokens of each document
+        query_terms (list[str]): Query tokens
+        k1 (float): Term frequency saturation
+        b (float): Document length normalization
+        epsilon (float): Floor for negative IDF values, as a fraction of the average IDF
+
+    Returns:
+        np.ndarray: float32 score per document
+    """
+    scores = np.zeros(len(tokenized_docs), dtype=np.float32)
+
+    postings = _query_postings(tokenized_docs, query_terms, epsilon)
+    if postings is None:
+        return scores
+
+    docs, _, tf, doc_len, idf, avgdl = postings
+    np.add.at(scores, docs, _bm25_contrib(tf, doc_len, idf, avgdl, k1, b).astype(np.float32))
+    return scores
+
+def bm25_top_k(tokenized_docs, query_terms, top_k, k1=1.5, b=0.75, epsilon=0.25):
+    """
+    Exact top-k BM25 scores using MaxScore pruning
+
+    Query terms are visited in descending order of their maximum possible contribution.
+    Once the k-th best partial score reaches the summed upper bound of the remaining terms,
+    unseen documents can no longer enter the top k: the remaining posting lists are only
+    probed for the surviving candidates instead of being scanned.
+
+    Args:
+        tokenized_docs (list[list[str]]): Tokens of each document
+        query_terms (list[str]): Query tokens
+        top_k (int): Number of best documents to return
+        k1 (float): Term frequency saturation
+        b (float): Document length normalization
+        epsilon (float): Floor for negative IDF values, as a fraction of the average IDF
+
+    Returns:
+        list[tuple[int, float]]: (document index, score) pairs for documents containing a
+        query term, best first
+    """
+    postings = _query_postings(tokenized_docs, query_terms, epsilon)
+    if postings is None or top_k <= 0:
+        return []
+
+    docs, terms, tf, doc_len, idf, avgdl = postings
+    scores = np.zeros(len(tokenized_docs), dtype=np.float32)
+
+    # The bounds assume every contribution is positive; score exhaustively otherwise
+    if (idf <= 0).any():
+        np.add.at(scores, docs, _bm25_contrib(tf, doc_len, idf, avgdl, k1, b).astype(np.float32))
+        return heapq.nlargest(top_k, ((int(d), float(scores[d])) for d in np.unique(docs)), key=lambda t: t[1])
+
+    # Posting list per query term (doc ids ascending), with its upper bound taken at max tf
+    # and min doc length
+    order = np.argsort(terms, kind="stable")
+    docs, terms, tf, doc_len, idf = docs[order], terms[order], tf[order], doc_len[order], idf[order]
+    term_ids, starts = np.unique(terms, return_index=True)
+    bounds = np.append(starts, len(terms))
+    lists = []
+    for i in range(len(term_ids)):
+        lo, hi = bounds[i], bounds[i + 1]
+        max_score = float(_bm25_contrib(tf[lo:hi].max(), doc_len[lo:hi].min(), idf[lo], avgdl, k1, b))
+        lists.append((max_score, lo, hi))
+    lists.sort(key=lambda t: t[0], reverse=True)
+
+    # Upper bound a document can still gain from list i onwards
+    remaining = np.cumsum([ms for ms, _, _ in lists][::-1])[::-1]
+    seen = np.empty(0, dtype=np.int64)
+    threshold = 0.0
+
+    for i, (_, lo, hi) in enumerate(lists):
+        list_docs = docs[lo:hi]
+        if threshold > 0 and threshold >= remaining[i]:
+            # Drop candidates that cannot reach the k-th score, then probe this list for the rest
+            seen = seen[scores[seen] + remaining[i] >= threshold]
+            pos = np.minimum(np.searchsorted(list_docs, seen), len(list_docs) - 1)
+            idx = lo + pos[list_docs[pos] == seen]
+        else:
+            idx = np.arange(lo, hi)
+            seen = np.union1d(seen, list_docs)
+
+        # A document appears at most once per posting list
+        scores[docs[idx]] += _bm25_contrib(tf[idx], doc_len[idx], idf[idx], avgdl, k1, b).astype(np.float32)
+
+        if len(seen) >= top_k:
+            threshold = float(np.partition(scores[seen], -top_k)[-top_k])
+
+    return heapq.nlargest(top_k, ((int(d), float(scores[d])) for d in seen), key=lambda t: t[1])
+
+def bm25_filter(conn, threshold=0.3, top_k=None):
     cur = conn.cursor()
     
     # Get all actions with their domains
@@ -67,36 +225,51 @@ def bm25_filter(db_path="intents.db", threshold=0.3):
     
     print(f"Processing {len(domain_groups)} domains...")
     
-    # Process each domain with its specific intent keywords
-    for domain, actions in domain_groups.items():
-        print(f"Scoring {len(actions)} actions for {domain}")
+    # Scores are staged in an in-memory scratch db and applied to intents in one statement
+    cur.execute("ATTACH DATABASE ':memory:' AS scratch")
+    scored = 0
+    try:
+        cur.execute("CREATE TABLE scratch.bm25 (id INTEGER PRIMARY KEY, score REAL)")
         
-        # Get domain-specific keywords
-        query_terms = get_domain_intent_keywords(domain)
-        print(f"  Using keywords: {query_terms}")
-        
-        # Prepare BM25 for this domain
-        action_texts = [action[1] for action in actions]
-        tokenized_actions = [action.lower().split() for action in action_texts]
-        
-        if not tokenized_actions:
-            continue
-            
-        bm25 = BM25Okapi(tokenized_actions)
-        
-        # Score each action against domain-specific terms
-        scores = bm25.get_scores([term.lower() for term in query_terms])
-        
-        # Update database with scores
-        for i, (action_id, action_text) in enumerate(actions):
-            score = float(scores[i]) if i < len(scores) else 0.0
+        # Process each domain with its specific intent keywords, all in one transaction
+        with conn:
+            for domain, actions in domain_groups.items():
+                print(f"Scoring {len(actions)} actions for {domain}")
+                
+                # Get domain-specific keywords
+                query_terms = get_domain_intent_keywords(domain)
+                print(f"  Using keywords: {query_terms}")
+                
+                # Prepare BM25 for this domain
+                action_texts = [action[1] for action in actions]
+                tokenized_actions = [tokenize(action) for action in action_texts]
+                
+                if not tokenized_actions:
+                    continue
+                    
+                # Score each action against domain-specific terms
+                if top_k is None:
+                    scores = bm25_scores(tokenized_actions, query_terms)
+                    updates = [(float(scores[i]), action_id) for i, (action_id, _) in enumerate(actions)]
+                else:
+                    # Only the best top_k actions per domain get a score; the rest are reset to NULL
+                    # so stale scores from earlier runs can't pass for top-k results
+                    top = dict(bm25_top_k(tokenized_actions, query_terms, top_k))
+                    updates = [(top.get(i), action_id) for i, (action_id, _) in enumerate(actions)]
+                
+                scored += sum(score is not None for score, _ in updates)
+                
+                cur.executemany("""
+                    INSERT INTO scratch.bm25 (score, id) VALUES (?, ?)
+                """, updates)
             
+            # Update database with scores
             cur.execute("""
-                UPDATE intents SET bm25_score = ? WHERE id = ?
-            """, (score, action_id))
-    
-    conn.commit()
-    conn.close()
+                UPDATE main.intents SET bm25_score = scratch.bm25.score
+                FROM scratch.bm25 WHERE main.intents.id = scratch.bm25.id
+            """)
+    finally:
+        cur.execute("DETACH DATABASE scratch")
     
-    print(f"Updated BM25 scores for {len(rows)} actions across {len(domain_groups)} domains")
+    print(f"Updated BM25 scores for {scored} of {len(rows)} actions across {len(domain_groups)} domains")
 
@@ -1,21 +1,38 @@
-import sqlite3
 import json
 
-def build_training_jsonl(output_path="training_data.jsonl", db_path="intents.db"):
-    conn = sqlite3.connect(db_path)
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+FLUSH_BYTES = 1 << 16
+
+def _dumps(record):
+    if orjson is not None:
+        return orjson.dumps(record)
+    # Match orjson's output byte for byte: compact separators, raw UTF-8
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode()
+
+def build_training_jsonl(conn, output_path="training_data.jsonl"):
     cur = conn.cursor()
 
+    # Stream rows from the cursor instead of materializing the result set
     rows = cur.execute("""
         SELECT domain, action_text, inferred_intent FROM intents
         WHERE inferred_intent IS NOT NULL AND label_source = 'pseudo'
-    """).fetchall()
+    """)
 
-    with open(output_path, 'w') as f:
+    buf = bytearray()
+    with open(output_path, 'wb', buffering=1 << 20) as f:
         for domain, action, label in rows:
-            json.dump({
+            buf += _dumps({
                 "input": f"{domain} - {action}",
                 "label": label
-            }, f)
-            f.write("\n")
+            })
+            buf += b"\n"
+
+            if len(buf) >= FLUSH_BYTES:
+                f.write(buf)
+                buf.clear()
 
-    conn.close()
\ No newline at end of file
+        f.write(buf)
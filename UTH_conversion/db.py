@@ -0,0 +1,14 @@
+import sqlite3
+
+def open_db(db_path="intents.db"):
+    """Open a SQLite connection tuned for the pipeline (WAL, relaxed fsync, shared readers)"""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+
+    cur.execute("PRAGMA journal_mode=WAL;")
+    cur.execute("PRAGMA synchronous=NORMAL;")
+    cur.execute("PRAGMA busy_timeout=10000;")
+    cur.execute("PRAGMA temp_store=MEMORY;")
+    cur.execute("PRAGMA mmap_size=268435456;")
+
+    return conn
@@ -1,43 +1,126 @@
 import json
-import sqlite3
+from db import open_db
 import os
+import queue
+import sqlite3
+import threading
+from itertools import chain
 from tqdm import tqdm
 
-def convert_jsonl_to_sqlite(input_file, db_path = "intents.db"):
-    conn = sqlite3.connect(db_path)
+BATCH_SIZE = 500
+QUEUE_SIZE = 16
+
+# 7 columns per row; stay under SQLite's conservative 999 bound-parameter limit
+ROWS_PER_INSERT = 999 // 7
+
+INSERT_PREFIX = "INSERT INTO intents (domain, url, page_title, action_text, bm25_score, confidence_score, label_source) VALUES "
+INSERT_SQL = INSERT_PREFIX + ",".join(["(?, ?, ?, ?, ?, ?, ?)"] * ROWS_PER_INSERT)
+
+def insert_rows(cursor, rows):
+    """Insert rows with multi-row VALUES statements of up to ROWS_PER_INSERT rows each"""
+    for start in range(0, len(rows), ROWS_PER_INSERT):
+        chunk = rows[start:start + ROWS_PER_INSERT]
+        sql = INSERT_SQL if len(chunk) == ROWS_PER_INSERT else INSERT_PREFIX + ",".join(["(?, ?, ?, ?, ?, ?, ?)"] * len(chunk))
+        cursor.execute(sql, list(chain.from_iterable(chunk)))
+
+def _put(batches, item, stop):
+    """Queue an item, giving up once the writer has stopped consuming"""
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+def _read_batches(input_file, batches, errors, stop):
+    """Producer: parse JSONL lines and push flattened action rows in batches"""
+    try:
+        buf = []
+        with open(input_file, "r") as f:
+            for line in tqdm(f, desc="Inserting Rows"):
+                item = json.loads(line)
+
+                for action in item.get("visible_actions", []):
+                    buf.append((
+                    item.get("domain"), item.get("url"), item.get("page_title"), action, item.get("bm25_score", None), item.get("confidence_score", None), "raw"
+                    ))
+
+                if stop.is_set():
+                    return
+
+                if len(buf) >= BATCH_SIZE:
+                    _put(batches, buf, stop)
+                    buf = []
+
+        if buf:
+            _put(batches, buf, stop)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        _put(batches, None, stop)
+
+def _write_batches(conn, batches, errors, stop):
+    """Consumer: insert batches as they arrive, on the thread that owns the connection"""
     cursor = conn.cursor()
 
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS intents (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        domain TEXT,
-        url TEXT,
-        page_title TEXT,
-        action_text TEXT,
-        bm25_score REAL,
-        confidence_score REAL,
-        label_source TEXT,
-        inferred_intent TEXT
-    );
-    """
-    )
-
-    with open(input_file, "r") as f:
-        for line in tqdm(f, desc="Inserting Rows"):
-            item = json.loads(line)
-
-            for action in item.get("visible_actions", []):
-                cursor.execute("""
-                INSERT INTO intents (domain, url, page_title, action_text, bm25_score, confidence_score, label_source)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                item.get("domain"), item.get("url"), item.get("page_title"), action, item.get("bm25_score", None), item.get("confidence_score", None), "raw"
-                )
-                )
-
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS intents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            domain TEXT,
+            url TEXT,
+            page_title TEXT,
+            action_text TEXT,
+            bm25_score REAL,
+            confidence_score REAL,
+            label_source TEXT,
+            inferred_intent TEXT
+        );
+        """
+        )
+
+        cursor.execute("PRAGMA cache_size=-200000;")
+
+        # Single transaction for the whole file, so a failed load leaves nothing behind
+        cursor.execute("BEGIN;")
+        while (batch := batches.get()) is not None:
+            insert_rows(cursor, batch)
+
+        if errors:
+            cursor.execute("ROLLBACK;")
+            return
+
+        # Indexes for the labeling, export and BM25 grouping queries, built once after the
+        # bulk load so the insert loop doesn't pay for b-tree maintenance
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_intents_label ON intents(inferred_intent, label_source);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_intents_domain ON intents(domain);")
+        cursor.execute("COMMIT;")
+    except Exception as e:
+        errors.append(e)
+        if conn.in_transaction:
+            try:
+                cursor.execute("ROLLBACK;")
+            except sqlite3.Error:
+                pass
+    finally:
+        # Release the producer, whether or not it has finished, so it never blocks on a full queue
+        stop.set()
+
+def convert_jsonl_to_sqlite(conn, input_file):
+    # Parse on a background thread while this thread, which owns the connection, inserts
+    batches = queue.Queue(maxsize=QUEUE_SIZE)
+    errors = []
+    stop = threading.Event()
+
+    producer = threading.Thread(target=_read_batches, args=(input_file, batches, errors, stop), daemon=True)
+    producer.start()
+    _write_batches(conn, batches, errors, stop)
+    producer.join()
+
+    if errors:
+        raise errors[0]
 
 if __name__ == "__main__":
-    convert_jsonl_to_sqlite("../engenium/intents.jsonl")
+    conn = open_db("intents.db")
+    convert_jsonl_to_sqlite(conn, "../engenium/intents.jsonl")
+    conn.close()
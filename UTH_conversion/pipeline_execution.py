@@ -3,6 +3,7 @@ from file_converter import convert_jsonl_to_sqlite
 from self_labeling import pseudo_label_all
 from cleaned_data import build_training_jsonl
 from bm25_filter import bm25_filter
+from db import open_db
 import os
 
 def main():
@@ -14,17 +15,22 @@ def main():
         print("Crawled data not found. Run the crawler first.")
         return
     
-    print("Converting JSONL to SQLite...")
-    convert_jsonl_to_sqlite("../engenium/intents.jsonl")
-
-    print("applying bm25")
-    bm25_filter()
-
-    print("applying self-labeling")
-    pseudo_label_all()
-
-    print("building training data")
-    build_training_jsonl()
+    # All stages share one connection so the page cache stays warm between them
+    conn = open_db("intents.db")
+    try:
+        print("Converting JSONL to SQLite...")
+        convert_jsonl_to_sqlite(conn, input_path)
+
+        print("applying bm25")
+        bm25_filter(conn)
+
+        print("applying self-labeling")
+        pseudo_label_all(conn)
+
+        print("building training data")
+        build_training_jsonl(conn)
+    finally:
+        conn.close()
 
     print("Pipeline execution completed successfully.")
 
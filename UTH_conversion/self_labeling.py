@@ -1,14 +1,48 @@
-import sqlite3
 import requests
+import httpx
+import asyncio
+import multiprocessing
 import json
 import time
 from tqdm import tqdm
+from requests.adapters import HTTPAdapter
+
+# Shared keep-alive session so labeling calls reuse TCP connections
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_maxsize=64))
+SESSION.mount("https://", HTTPAdapter(pool_maxsize=64))
+SESSION.headers.update({"Accept": "application/json"})
 
 
 def build_prompt(domain, action_text):
     return f"what is the user's likely intent if they are on {domain} and click {action_text}?"
 
 
+def build_payload(prompt):
+    return {
+        "prompt": prompt,
+        "max_tokens": 50,
+        "temperature": 0.2,  # Low temperature for consistent classification
+        "system_prompt": """You are an intent classifier for web interactions. 
+        Given a user action on a website, classify the intent that you think the user is trying to achieve.
+        Respond with the intent category, and a confidence score between 0 and 1."""
+    }
+
+
+def parse_api_response(result):
+    """Extract the intent from a classifier API response"""
+    if "intent" in result:
+        return result["intent"].strip().lower()
+    elif "response" in result:
+        return result["response"].strip().lower()
+    elif "text" in result:
+        return result["text"].strip().lower()
+    else:
+        # If response format is unexpected, try to extract first word
+        text = str(result).strip().lower()
+        return text.split()[0] if text else "navigate"
+
+
 def label_with_mistral_api(prompt, api_url="http://localhost:8000/classify", max_retries=3, timeout=30):
     """
     Send prompt to FastAPI server running Mistral model for intent classification
@@ -24,45 +58,16 @@ def label_with_mistral_api(prompt, api_url="http://localhost:8000/classify", max
     """
     
     # Prepare the request payload
-    payload = {
-        "prompt": prompt,
-        "max_tokens": 50,
-        "temperature": 0.2,  # Low temperature for consistent classification
-        "system_prompt": """You are an intent classifier for web interactions. 
-        Given a user action on a website, classify the intent that you think the user is trying to achieve.
-        Respond with the intent category, and a confidence score between 0 and 1."""
-    }
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
+    payload = build_payload(prompt)
     
     for attempt in range(max_retries):
         try:
-            # Make the API request
-            response = requests.post(
-                api_url, 
-                data=json.dumps(payload), 
-                headers=headers, 
-                timeout=timeout
-            )
+            # Make the API request over the pooled session
+            response = SESSION.post(api_url, json=payload, timeout=timeout)
             
             # Check if request was successful
             if response.status_code == 200:
-                result = response.json()
-                
-                # Extract the intent from response
-                if "intent" in result:
-                    return result["intent"].strip().lower()
-                elif "response" in result:
-                    return result["response"].strip().lower()
-                elif "text" in result:
-                    return result["text"].strip().lower()
-                else:
-                    # If response format is unexpected, try to extract first word
-                    text = str(result).strip().lower()
-                    return text.split()[0] if text else "navigate"
+                return parse_api_response(response.json())
                     
             else:
                 print(f"API request failed with status {response.status_code}: {response.text}")
@@ -88,6 +93,50 @@ def label_with_mistral_api(prompt, api_url="http://localhost:8000/classify", max
     return fallback_classification(prompt)
 
 
+async def label_with_mistral_api_async(client, prompt, api_url="http://localhost:8000/classify", max_retries=3):
+    """
+    Async variant of label_with_mistral_api sharing one pooled httpx client
+    
+    Args:
+        client (httpx.AsyncClient): Client used for the request
+        prompt (str): The prompt to classify
+        api_url (str): FastAPI endpoint URL
+        max_retries (int): Number of retry attempts
+        
+    Returns:
+        str: Classified intent or fallback
+    """
+    payload = build_payload(prompt)
+
+    for attempt in range(max_retries):
+        try:
+            response = await client.post(api_url, json=payload)
+
+            if response.status_code == 200:
+                return parse_api_response(response.json())
+            else:
+                print(f"API request failed with status {response.status_code}: {response.text}")
+
+        except httpx.TimeoutException:
+            print(f"Request timeout on attempt {attempt + 1}/{max_retries}")
+
+        except httpx.ConnectError:
+            print(f"Connection error on attempt {attempt + 1}/{max_retries}. Is the FastAPI server running?")
+
+        except httpx.HTTPError as e:
+            print(f"Request error on attempt {attempt + 1}/{max_retries}: {e}")
+
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error on attempt {attempt + 1}/{max_retries}: {e}")
+
+        # Wait before retrying
+        if attempt < max_retries - 1:
+            await asyncio.sleep(2 ** attempt)  # Exponential backoff
+
+    print(f"API failed after {max_retries} attempts. Using fallback classification.")
+    return fallback_classification(prompt)
+
+
 def fallback_classification(prompt):
     """Print error when API is unavailable instead of generating noisy rule-based data"""
     print(f"ERROR: API classification failed for prompt: '{prompt[:50]}...'")
@@ -95,31 +144,63 @@ def fallback_classification(prompt):
     return None  # Return None to indicate failed classification
 
 
-def pseudo_label_all(db_path="intents.db", api_url="http://localhost:8000/classify"):
-    conn = sqlite3.connect(db_path)
+async def label_pairs_async(pairs, api_url="http://localhost:8000/classify", concurrency=32):
+    """Classify (domain, action) pairs concurrently, returning a dict of pair -> intent"""
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=64)
+
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+
+        async def label(domain, action):
+            async with sem:
+                return await label_with_mistral_api_async(client, build_prompt(domain, action), api_url)
+
+        intents = await asyncio.gather(*(label(domain, action) for domain, action in pairs))
+
+    return dict(zip(pairs, intents))
+
+
+def _label_chunk(task):
+    """Pool worker: classify a share of the distinct (domain, action) pairs"""
+    pairs, api_url, concurrency = task
+    return list(asyncio.run(label_pairs_async(pairs, api_url, concurrency)).items())
+
+
+def pseudo_label_all(conn, api_url="http://localhost:8000/classify", workers=4, concurrency=8):
     cur = conn.cursor()
 
     rows = cur.execute("""
         SELECT id, domain, action_text FROM intents WHERE inferred_intent IS NULL
     """).fetchall()
 
-    print(f"Labeling {len(rows)} intents using Mistral API at {api_url}")
+    # Scraped pages repeat the same actions, so classify each (domain, action) pair once
+    pairs = list(dict.fromkeys((domain, action) for _, domain, action in rows))
+
+    if not pairs:
+        print("No unlabeled intents found in database")
+        return
+
+    # Deal the distinct pairs out across the workers
+    tasks = [(pairs[start::workers], api_url, concurrency) for start in range(min(workers, len(pairs)))]
+
+    print(f"Labeling {len(pairs)} unique intents using Mistral API at {api_url} with {len(tasks)} workers")
+
+    cache = {}
+    with multiprocessing.Pool(len(tasks)) as pool:
+        for result in tqdm(pool.imap_unordered(_label_chunk, tasks), total=len(tasks), desc="Labeling intents"):
+            cache.update(result)
 
-    for row in tqdm(rows, desc="Labeling intents"):
-        id, domain, action = row
-        prompt = build_prompt(domain, action)
-        inferred_intent = label_with_mistral_api(prompt, api_url)
+    skipped = sum(intent is None for intent in cache.values())
+    if skipped:
+        print(f"Skipping database update for {skipped} failed classifications")
 
-        # Only update database if classification was successful
-        if inferred_intent is not None:
-            cur.execute("""
-                UPDATE intents SET inferred_intent = ?, label_source = ? WHERE id = ?
-            """, (inferred_intent, "mistral_api", id))
-        else:
-            print(f"Skipping database update for failed classification (ID: {id})")
+    # Fan the pair labels back out to their rows, updating by primary key
+    updates = [(cache[(domain, action)], "mistral_api", id) for id, domain, action in rows if cache[(domain, action)] is not None]
 
-    conn.commit()
-    conn.close()
+    with conn:
+        cur.executemany("""
+            UPDATE intents SET inferred_intent = ?, label_source = ? WHERE id = ?
+        """, updates)
 
 
 # For testing the API connection
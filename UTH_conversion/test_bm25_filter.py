@@ -0,0 +1,71 @@
+import random
+import sqlite3
+
+import numpy as np
+import pytest
+
+from bm25_filter import bm25_filter, bm25_scores, bm25_top_k
+
+
+def reference_top_k(docs, query, k):
+    scores = bm25_scores(docs, query)
+    matching = [i for i, doc in enumerate(docs) if set(doc) & set(query)]
+    return sorted((float(scores[i]) for i in matching), reverse=True)[:k]
+
+
+def test_top_k_with_negative_idf():
+    docs = [("the", "the", "add", "shop"), ("purchase", "add"), ("cart", "click", "purchase", "a", "add"), ("add", "click", "purchase", "the")]
+    query = ("buy", "add", "cart", "purchase", "order", "shop", "checkout", "wishlist")
+
+    got = [score for _, score in bm25_top_k(docs, query, 2)]
+
+    assert np.allclose(got, reference_top_k(docs, query, 2), atol=1e-4)
+    assert len(got) == 2
+
+
+def test_top_k_matches_exhaustive_scores():
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(12)]
+
+    for _ in range(3000):
+        docs = [tuple(rng.choice(words[:rng.randint(2, 12)]) for _ in range(rng.randint(0, 6))) for _ in range(rng.randint(1, 30))]
+        query = tuple(rng.sample(words, 4))
+        k = rng.randint(1, 6)
+
+        top = bm25_top_k(docs, query, k)
+        scores = bm25_scores(docs, query)
+
+        assert np.allclose([score for _, score in top], reference_top_k(docs, query, k), atol=1e-4)
+        for doc, score in top:
+            assert abs(scores[doc] - score) < 1e-4
+
+
+def test_top_k_matches_exhaustive_scores_on_sparse_corpora():
+    # Rare query terms keep IDF positive, so the pruned probing path is taken
+    rng = random.Random(1)
+    words = [f"w{i}" for i in range(200)]
+
+    for _ in range(200):
+        docs = [tuple(rng.choice(words) for _ in range(rng.randint(1, 8))) for _ in range(rng.randint(50, 300))]
+        query = tuple(rng.sample(words[:30], 8))
+        k = rng.randint(1, 10)
+
+        got = [score for _, score in bm25_top_k(docs, query, k)]
+
+        assert np.allclose(got, reference_top_k(docs, query, k), atol=1e-4)
+
+
+def test_bm25_filter_top_k_resets_scores_outside_the_top_k():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE intents (id INTEGER PRIMARY KEY, domain TEXT, action_text TEXT, bm25_score REAL)")
+    actions = ["Add to Cart", "Buy Now", "Add to Wishlist", "Search", "Help", "Sign in", "Orders", "Gift cards"]
+    conn.executemany("INSERT INTO intents (domain, action_text) VALUES (?, ?)", [("amazon.com", a) for a in actions])
+    conn.commit()
+
+    bm25_filter(conn)
+    full = dict(conn.execute("SELECT id, bm25_score FROM intents"))
+    bm25_filter(conn, top_k=2)
+    top = dict(conn.execute("SELECT id, bm25_score FROM intents WHERE bm25_score IS NOT NULL"))
+
+    assert len(top) == 2
+    assert sorted(top.values(), reverse=True) == pytest.approx(sorted(full.values(), reverse=True)[:2], abs=1e-4)
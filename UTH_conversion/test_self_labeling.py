@@ -0,0 +1,31 @@
+import sqlite3
+from multiprocessing.dummy import Pool
+
+import self_labeling
+
+
+def test_pseudo_label_all_labels_each_pair_once_and_updates_every_row(monkeypatch):
+    labeled = []
+
+    async def fake_label_pairs(pairs, api_url, concurrency):
+        labeled.extend(pairs)
+        return {pair: None if pair[1] == "Search" else pair[1].lower() for pair in pairs}
+
+    monkeypatch.setattr(self_labeling, "label_pairs_async", fake_label_pairs)
+    monkeypatch.setattr(self_labeling.multiprocessing, "Pool", Pool)
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE intents (id INTEGER PRIMARY KEY, domain TEXT, action_text TEXT, inferred_intent TEXT, label_source TEXT)")
+    actions = ["Add to Cart", "Buy Now", "Search"] * 20
+    conn.executemany("INSERT INTO intents (domain, action_text, label_source) VALUES (?, ?, 'raw')", [("amazon.com", a) for a in actions])
+    conn.commit()
+
+    self_labeling.pseudo_label_all(conn, workers=4)
+
+    assert sorted(labeled) == [("amazon.com", "Add to Cart"), ("amazon.com", "Buy Now"), ("amazon.com", "Search")]
+    rows = conn.execute("SELECT action_text, inferred_intent, label_source FROM intents").fetchall()
+    for action, intent, source in rows:
+        if action == "Search":
+            assert (intent, source) == (None, "raw")
+        else:
+            assert (intent, source) == (action.lower(), "mistral_api")
@@ -6,27 +6,23 @@ class IntentSpider(scrapy.Spider):
     allowed_domains = ["amazon.com"]
     start_urls = ["https://www.amazon.com/s?k=ssd"]  # You can generalize later
 
-    def parse(self, response):
-        actions = []
-
-        # Extract from buttons
-        actions += response.xpath("//button/text()").getall()
-
-        # Extract from anchors (only if they are visible)
-        actions += response.xpath("//a[normalize-space(text()) != '']/text()").getall()
+    # Buttons, visible anchors, input placeholders, labels, dropdown options and major
+    # headings, evaluated as one union so lxml walks the DOM once
+    ACTION_XPATH = " | ".join([
+        "//button/text()",
+        "//a[normalize-space(text()) != '']/text()",
+        "//input/@placeholder",
+        "//label/text()",
+        "//select/option/text()",
+        "//h1/text()",
+        "//h2/text()",
+    ])
 
-        # Extract from input placeholders or associated labels
-        actions += response.xpath("//input/@placeholder").getall()
-        actions += response.xpath("//label/text()").getall()
-
-        # Extract from dropdown menus
-        actions += response.xpath("//select/option/text()").getall()
-
-        # Extract from major headings (like h1, h2) — optional
-        actions += response.xpath("//h1/text() | //h2/text()").getall()
+    def parse(self, response):
+        raw = response.xpath(self.ACTION_XPATH).getall()
 
-        # Clean + deduplicate
-        actions = list(set(filter(None, [a.strip() for a in actions])))
+        # Clean + deduplicate, keeping first-seen order
+        actions = list(dict.fromkeys(s for s in (a.strip() for a in raw) if s))
 
         yield {
             "url": response.url,
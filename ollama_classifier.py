@@ -4,6 +4,8 @@ import uvicorn
 import httpx
 import asyncio
 import json
+import hashlib
+from collections import OrderedDict
 from typing import Optional
 import re
 import aiofiles
@@ -13,6 +15,20 @@ app = FastAPI(title="Ollama Mistral Intent Classifier", version="1.0.0")
 
 # Ollama configuration
 OLLAMA_URL = "http://localhost:11434"  # Use the quantized version for better performance
+OLLAMA_PARALLEL = 8  # Match Ollama's parallel request slots
+
+PSEUDO_LABELS_PATH = "pseudo_labels.jsonl"
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 256
+
+# Pseudo-label records waiting to be appended by the background writer
+log_queue: asyncio.Queue = asyncio.Queue(LOG_QUEUE_SIZE)
+log_writer: Optional[asyncio.Task] = None
+
+# LRU of classification results keyed by classification_key, plus calls still in flight
+CLASSIFICATION_CACHE_SIZE = 100_000
+CLASSIFICATION_CACHE: OrderedDict[str, tuple[str, str]] = OrderedDict()
+INFLIGHT: dict[str, asyncio.Future] = {}
 
 # Request model
 class ClassificationRequest(BaseModel):
@@ -52,7 +68,53 @@ async def check_ollama_health():
     except Exception as e:
         return False, f"Cannot connect to Ollama: {str(e)}"
 
+def classification_key(prompt: str, temperature: float) -> str:
+    """Cache key for a classification: blake2b digest of the prompt and temperature"""
+    return hashlib.blake2b(f"{temperature}\x00{prompt}".encode(), digest_size=16).hexdigest()
+
 async def classify_with_ollama(prompt: str, system_prompt: str, temperature: float = 0.1) -> tuple[str, str]:
+    """
+    Classify a prompt, reusing cached results for repeated (prompt, temperature) pairs
+    Concurrent requests for the same pair share a single Ollama call
+    Returns: (classified_intent, raw_response)
+    """
+    key = classification_key(prompt, temperature)
+
+    if key in CLASSIFICATION_CACHE:
+        CLASSIFICATION_CACHE.move_to_end(key)
+        return CLASSIFICATION_CACHE[key]
+
+    if key in INFLIGHT:
+        leader = INFLIGHT[key]
+        try:
+            return await asyncio.shield(leader)
+        except asyncio.CancelledError:
+            # The leading request was cancelled, not this one: classify it ourselves
+            if leader.cancelled() and not asyncio.current_task().cancelling():
+                return await classify_with_ollama(prompt, system_prompt, temperature)
+            raise
+
+    future = asyncio.get_running_loop().create_future()
+    INFLIGHT[key] = future
+    try:
+        result = await _classify_with_ollama_uncached(prompt, system_prompt, temperature)
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved when nobody else is waiting
+        raise
+    else:
+        future.set_result(result)
+        CLASSIFICATION_CACHE[key] = result
+        if len(CLASSIFICATION_CACHE) > CLASSIFICATION_CACHE_SIZE:
+            CLASSIFICATION_CACHE.popitem(last=False)
+        return result
+    finally:
+        del INFLIGHT[key]
+        # Cancelled before resolving: release coalesced waiters instead of leaving them hanging
+        if not future.done():
+            future.cancel()
+
+async def _classify_with_ollama_uncached(prompt: str, system_prompt: str, temperature: float) -> tuple[str, str]:
     """
     Send prompt to Ollama Mistral model for intent classification
     Returns: (classified_intent, raw_response)
@@ -106,6 +168,39 @@ Intent:
         raise HTTPException(status_code=500, detail=f"Ollama request failed: {str(e)}")
 
 
+def log_pseudo_label(prompt: str, intent: str):
+    """Queue a pseudo-label record for the background writer without blocking the request"""
+    try:
+        log_queue.put_nowait({"input": prompt, "output": intent})
+    except asyncio.QueueFull:
+        print(f"Warning: pseudo-label log queue full, dropping record for prompt: '{prompt[:50]}...'")
+
+
+async def drain_log_queue():
+    """Single writer that appends queued records to the pseudo-label JSONL in batches"""
+    async with aiofiles.open(PSEUDO_LABELS_PATH, mode="a") as f:
+        while True:
+            batch = [await log_queue.get()]
+            while not log_queue.empty() and len(batch) < LOG_BATCH_SIZE:
+                batch.append(log_queue.get_nowait())
+
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(json.dumps(record) + "\n")
+                except (TypeError, ValueError) as e:
+                    print(f"Warning: skipping unserializable pseudo-label: {e}")
+
+            try:
+                await f.write("".join(lines))
+                await f.flush()
+            except Exception as e:
+                print(f"Warning: failed to write {len(lines)} pseudo-labels to {PSEUDO_LABELS_PATH}: {e}")
+            finally:
+                for _ in batch:
+                    log_queue.task_done()
+
+
 def extract_intent_from_response(raw_response: str) -> str:
     return raw_response.strip().capitalize()
 
@@ -113,7 +208,10 @@ def extract_intent_from_response(raw_response: str) -> str:
 
 @app.on_event("startup")
 async def startup_event():
-    """Check Ollama health on startup"""
+    """Start the pseudo-label writer and check Ollama health on startup"""
+    global log_writer
+    log_writer = asyncio.create_task(drain_log_queue())
+
     health, message = await check_ollama_health()
     if health:
         print(f"{message}")
@@ -122,6 +220,25 @@ async def startup_event():
         print(f"Warning: {message}")
         print("The API will start but may fail requests until Ollama/Mistral is available")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued pseudo-labels before stopping the writer"""
+    if log_writer is None:
+        return
+
+    # A dead writer (e.g. the log file could not be opened) would never drain the queue
+    if log_writer.done():
+        if not log_writer.cancelled() and log_writer.exception() is not None:
+            print(f"Warning: pseudo-label writer stopped: {log_writer.exception()}")
+        return
+
+    await log_queue.join()
+    log_writer.cancel()
+    try:
+        await log_writer
+    except asyncio.CancelledError:
+        pass
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -178,12 +295,7 @@ async def classify_intent(request: ClassificationRequest):
         
         processing_time = time.time() - start_time
 
-        async def save_to_jsonl(prompt: str, intent: str, path="pseudo_labels.jsonl"):
-            async with aiofiles.open(path, mode="a") as f:
-                line = json.dumps({"input": prompt, "output": intent})
-                await f.write(line + "\n")
-
-        await save_to_jsonl(request.prompt, predicted_intent)
+        log_pseudo_label(request.prompt, predicted_intent)
 
         return ClassificationResponse(
             intent=predicted_intent,
@@ -217,14 +329,23 @@ async def get_ollama_models():
 
 @app.post("/batch-label")
 async def batch_label(data: list[str]):
+    sem = asyncio.Semaphore(OLLAMA_PARALLEL)
+
+    async def bounded(prompt: str):
+        async with sem:
+            return await classify_with_ollama(prompt, system_prompt="")
+
+    outcomes = await asyncio.gather(*(bounded(prompt) for prompt in data), return_exceptions=True)
+
     results = []
-    for prompt in data:
-        try:
-            intent, raw = await classify_with_ollama(prompt, system_prompt="")
-            await save_to_jsonl(prompt, intent)
+    for prompt, outcome in zip(data, outcomes):
+        if isinstance(outcome, Exception):
+            results.append({"input": prompt, "error": str(outcome)})
+        else:
+            intent, raw = outcome
             results.append({"input": prompt, "intent": intent})
-        except Exception as e:
-            results.append({"input": prompt, "error": str(e)})
+            log_pseudo_label(prompt, intent)
+
     return results
 
 